@@ -0,0 +1,113 @@
+"""Per-request logging overhead benchmark.
+
+Drives the real ASGI app in-process (no network, no Mongo) with concurrent
+requests to /api/health/live, which only runs the middleware stack and the
+access log. Each run swaps the logging setup:
+
+    none   - access logs filtered out by level (baseline)
+    sync   - JSON handler writing from the event loop
+    queue  - JSON handler behind the background log thread
+
+The sink can be slowed down to mimic a congested stdout or log shipper pipe.
+
+Usage:
+    python bench_logging.py --requests 5000 --concurrency 100 --sink-delay-ms 0.2
+"""
+import asyncio
+import logging
+import statistics
+import time
+
+import typer
+
+import server
+
+app = typer.Typer(add_completion=False)
+
+
+class SlowSink:
+    """File-like sink that blocks for a fixed time on every write"""
+
+    def __init__(self, delay_ms: float):
+        self.delay = delay_ms / 1000
+        self.lines = 0
+
+    def write(self, data: str) -> int:
+        if self.delay:
+            time.sleep(self.delay)
+        self.lines += 1
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+
+async def call_app(path: str) -> None:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await server.app(scope, receive, send)
+
+
+async def run_load(requests: int, concurrency: int) -> list:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await call_app("/api/health/live")
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return latencies
+
+
+@app.command()
+def bench(
+    requests: int = typer.Option(5000, help="Requests per mode"),
+    concurrency: int = typer.Option(100, help="Concurrent in-flight requests"),
+    sink_delay_ms: float = typer.Option(0.0, help="Blocking time per written log line"),
+    sample_rate: float = typer.Option(1.0, help="LOG_INFO_SAMPLE_RATE for the sync/queue modes"),
+):
+    """Compare request latency with no, synchronous and queued logging"""
+    typer.echo(f"{'mode':<6} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'lines':>7}")
+    for mode in ("none", "sync", "queue"):
+        sink = SlowSink(sink_delay_ms)
+        server.configure_logging(stream=sink, use_queue=mode == "queue", sample_rate=sample_rate)
+        if mode == "none":
+            logging.getLogger().setLevel(logging.WARNING)
+
+        asyncio.run(run_load(min(requests, 200), concurrency))  # warm up
+        started = time.perf_counter()
+        latencies = asyncio.run(run_load(requests, concurrency))
+        elapsed = time.perf_counter() - started
+        server.stop_log_listener()
+
+        latencies.sort()
+        typer.echo(
+            f"{mode:<6} {requests / elapsed:>9.0f} {statistics.median(latencies):>8.3f} "
+            f"{latencies[int(len(latencies) * 0.99) - 1]:>8.3f} {sink.lines:>7}"
+        )
+
+
+if __name__ == "__main__":
+    app()
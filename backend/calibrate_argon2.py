@@ -0,0 +1,76 @@
+"""Argon2 parameter calibration.
+
+Measures password hashing time on the current host and picks
+time/memory/parallelism so that a single hash takes roughly the target
+latency. The output is a block of environment variables that can be pasted
+into backend/.env; existing hashes keep working and are upgraded on the next
+successful login (see `login` in server.py).
+
+Usage:
+    python calibrate_argon2.py --target-ms 250 --max-memory-mib 64
+"""
+import os
+import statistics
+import time
+
+import typer
+from argon2 import PasswordHasher
+
+app = typer.Typer(add_completion=False)
+
+SAMPLE_PASSWORD = "calibration-Password-123!"
+
+
+def measure_hash_ms(time_cost: int, memory_cost: int, parallelism: int, samples: int) -> float:
+    """Return median hash time in milliseconds for the given parameters"""
+    hasher = PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+    hasher.hash(SAMPLE_PASSWORD)  # warm up allocator / caches
+
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        hasher.hash(SAMPLE_PASSWORD)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    return statistics.median(timings)
+
+
+@app.command()
+def calibrate(
+    target_ms: float = typer.Option(250.0, help="Target hash latency in milliseconds"),
+    max_memory_mib: int = typer.Option(64, help="Upper bound for memory cost in MiB"),
+    min_memory_mib: int = typer.Option(19, help="Lower bound for memory cost in MiB (OWASP minimum)"),
+    parallelism: int = typer.Option(0, help="Lanes to use; 0 picks min(cpu count, 4)"),
+    max_time_cost: int = typer.Option(10, help="Upper bound for time cost (iterations)"),
+    samples: int = typer.Option(5, help="Hashes measured per candidate"),
+):
+    """Pick Argon2 parameters that hit TARGET_MS on this host"""
+    lanes = parallelism or min(os.cpu_count() or 1, 4)
+
+    # Memory is the main defence against GPU cracking, so take as much of the
+    # budget as the target allows before spending time on extra iterations.
+    memory_mib = max_memory_mib
+    time_cost = 1
+    elapsed = measure_hash_ms(time_cost, memory_mib * 1024, lanes, samples)
+    while elapsed > target_ms and memory_mib > min_memory_mib:
+        memory_mib = max(min_memory_mib, memory_mib // 2)
+        elapsed = measure_hash_ms(time_cost, memory_mib * 1024, lanes, samples)
+        typer.echo(f"t={time_cost} m={memory_mib}MiB p={lanes}: {elapsed:.1f} ms")
+
+    while time_cost < max_time_cost:
+        candidate = measure_hash_ms(time_cost + 1, memory_mib * 1024, lanes, samples)
+        typer.echo(f"t={time_cost + 1} m={memory_mib}MiB p={lanes}: {candidate:.1f} ms")
+        if candidate > target_ms:
+            break
+        time_cost += 1
+        elapsed = candidate
+
+    typer.echo("")
+    typer.echo(f"# Argon2 calibrated for ~{target_ms:.0f} ms (measured {elapsed:.1f} ms)")
+    typer.echo(f'ARGON2_TIME_COST="{time_cost}"')
+    typer.echo(f'ARGON2_MEMORY_COST="{memory_mib * 1024}"')
+    typer.echo(f'ARGON2_PARALLELISM="{lanes}"')
+
+
+if __name__ == "__main__":
+    app()
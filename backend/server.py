@@ -1,7 +1,15 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, Request, Response
+import time
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, APIRouter, BackgroundTasks, Depends, HTTPException, Query, status, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReadPreference, monitoring
+from pymongo.errors import (
+    ExecutionTimeout, NetworkTimeout, ServerSelectionTimeoutError, WaitQueueTimeoutError
+)
 from pydantic import BaseModel, Field, validator
 from typing import List, Optional, Dict, Any, Union, Literal
 from datetime import datetime, timezone, timedelta
@@ -9,41 +17,579 @@ from dotenv import load_dotenv
 from pathlib import Path
 import os
 import logging
+import logging.handlers
+import queue
+import random
+import sys
+import atexit
+import contextvars
 import uuid
 import hashlib
 import hmac
 import base64
 import json
+import asyncio
+import threading
+import re
+from collections import deque
+from contextlib import asynccontextmanager, suppress
 import redis.asyncio as redis
-from argon2 import PasswordHasher
+from argon2 import PasswordHasher, profiles
 from argon2.exceptions import VerifyMismatchError
 
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Configure logging
+# Records are queued from the event loop and formatted/written by a background
+# thread, so a slow stdout or log pipe never stalls request handling.
+request_context: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar(
+    'request_context', default={}
+)
+
+class RequestContextFilter(logging.Filter):
+    """Copy request id/route onto records before they leave the request's context"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in request_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of INFO and lower records; warnings and errors always pass"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        return self.rate >= 1.0 or random.random() < self.rate
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with request context fields when present"""
+
+    context_fields = ('request_id', 'route', 'method', 'status_code', 'latency_ms')
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in self.context_fields:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full"""
+
+    dropped = 0
+    listener: Optional[logging.handlers.QueueListener] = None
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Leave message and traceback formatting to JsonFormatter on the
+        # listener thread; the context filter has already run by now
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def stop_log_listener() -> None:
+    """Drain the log queue and stop its background thread"""
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, DroppingQueueHandler) and handler.listener:
+            handler.listener.stop()
+            handler.listener = None
+
+def configure_logging(
+    stream=None,
+    use_queue: bool = os.environ.get('LOG_ASYNC', 'true').lower() == 'true',
+    sample_rate: float = float(os.environ.get('LOG_INFO_SAMPLE_RATE', 1.0)),
+) -> Optional[logging.handlers.QueueListener]:
+    """Install JSON logging on the root logger; returns the listener when queued"""
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+    
+    if use_queue:
+        log_queue = queue.Queue(int(os.environ.get('LOG_QUEUE_SIZE', 10000)))
+        handler: logging.Handler = DroppingQueueHandler(log_queue)
+    else:
+        handler = output
+    handler.addFilter(RequestContextFilter())
+    handler.addFilter(SamplingFilter(sample_rate))
+    
+    stop_log_listener()
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
+    
+    # uvicorn installs its own synchronous handlers (propagate=False) before it
+    # imports the app; route its records through the queue as well
+    for name in ('uvicorn', 'uvicorn.error', 'uvicorn.access'):
+        uvicorn_logger = logging.getLogger(name)
+        for existing in uvicorn_logger.handlers[:]:
+            uvicorn_logger.removeHandler(existing)
+        uvicorn_logger.propagate = True
+    # RequestLoggingMiddleware writes the access log, with request id and latency
+    logging.getLogger('uvicorn.access').disabled = True
+    
+    if not use_queue:
+        return None
+    listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    handler.listener = listener
+    listener.start()
+    return listener
+
+def log_queue_stats() -> Dict[str, Any]:
+    """Queue depth and dropped record count of the active log pipeline"""
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, DroppingQueueHandler):
+            return {
+                "async": True,
+                "queued": handler.queue.qsize(),
+                "capacity": handler.queue.maxsize,
+                "dropped": handler.dropped,
+            }
+    return {"async": False, "queued": 0, "capacity": 0, "dropped": 0}
+
+configure_logging()
+# Flush whatever is still queued when the worker exits
+atexit.register(stop_log_listener)
+
+logger = logging.getLogger(__name__)
+
 # Security setup
-ph = PasswordHasher()
+# Argon2 cost is tuned per host with calibrate_argon2.py; stored hashes made with
+# other parameters are upgraded on the next successful login.
+ph = PasswordHasher(
+    time_cost=int(os.environ.get('ARGON2_TIME_COST', profiles.RFC_9106_LOW_MEMORY.time_cost)),
+    memory_cost=int(os.environ.get('ARGON2_MEMORY_COST', profiles.RFC_9106_LOW_MEMORY.memory_cost)),
+    parallelism=int(os.environ.get('ARGON2_PARALLELISM', profiles.RFC_9106_LOW_MEMORY.parallelism)),
+)
 security = HTTPBearer()
 
 # Database connections
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
-# Redis connection (optional for development)
-try:
-    redis_client = redis.from_url(os.environ.get('REDIS_URL', 'redis://localhost:6379'))
-    redis_available = True
-except Exception:
-    redis_client = None
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', 50))
+
+class PoolStats:
+    """Checkout counters for the connection pool of one server"""
+
+    def __init__(self):
+        self.in_use = 0
+        self.waiting = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "checkouts": self.checkouts,
+            "checkout_failures": self.checkout_failures,
+            "avg_wait_ms": round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 3),
+        }
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Track connection pool checkouts per server for per-worker pool sizing.
+
+    maxPoolSize applies to each server's pool separately, and secondary reads
+    give a worker one pool per replica set member, so counters are kept per
+    server address rather than summed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wait_started: Dict[Any, float] = {}
+        self._pools: Dict[str, PoolStats] = {}
+
+    def _pool(self, event) -> PoolStats:
+        host, port = event.address
+        return self._pools.setdefault(f"{host}:{port}", PoolStats())
+
+    def _finish_wait(self, event, pool: PoolStats) -> Optional[float]:
+        started = self._wait_started.pop((event.address, threading.get_ident()), None)
+        pool.waiting = max(0, pool.waiting - 1)
+        if started is None:
+            return None
+        return (time.perf_counter() - started) * 1000
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self._wait_started[(event.address, threading.get_ident())] = time.perf_counter()
+            self._pool(event).waiting += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            pool = self._pool(event)
+            waited_ms = self._finish_wait(event, pool)
+            pool.in_use += 1
+            pool.checkouts += 1
+            if waited_ms is not None:
+                pool.total_wait_ms += waited_ms
+                pool.max_wait_ms = max(pool.max_wait_ms, waited_ms)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            pool = self._pool(event)
+            self._finish_wait(event, pool)
+            pool.checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            pool = self._pool(event)
+            pool.in_use = max(0, pool.in_use - 1)
+
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_created(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_closed(self, event): pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_pool_size": MONGO_MAX_POOL_SIZE,
+                "servers": {address: pool.as_dict() for address, pool in self._pools.items()},
+            }
+
+pool_metrics = PoolMetricsListener()
+
+# Clients are created by init_clients() during app startup, not at import time
+client: Optional[AsyncIOMotorClient] = None
+db = None
+companies_read = None
+redis_client = None
+redis_available = False
+
+# Per-endpoint server-side deadlines (maxTimeMS) for read operations
+MONGO_DEADLINES_MS = {
+    'search': int(os.environ.get('MONGO_DEADLINE_SEARCH_MS', 500)),
+    'login': int(os.environ.get('MONGO_DEADLINE_LOGIN_MS', 1500)),
+    'register': int(os.environ.get('MONGO_DEADLINE_REGISTER_MS', 2000)),
+}
+
+# Errors meaning Mongo is too slow or unreachable right now; answered with 503
+MONGO_TIMEOUT_ERRORS = (
+    ExecutionTimeout, NetworkTimeout, ServerSelectionTimeoutError, WaitQueueTimeoutError
+)
+
+# Admission control
+class AdmissionClass:
+    """Concurrency limit and bounded wait queue for one priority class"""
+
+    def __init__(self, name: str, priority: int, limit: int, max_queue: int, max_wait_ms: int):
+        self.name = name
+        self.priority = priority  # lower value is served first
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait_ms / 1000
+        self.queue: deque = deque()
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self.max_queue_depth = 0
+
+class AdmissionController:
+    """Share a worker-wide concurrency budget between priority classes.
+
+    Requests run immediately while both the global and the class limit allow
+    it and no request of equal or higher priority is waiting. Otherwise they
+    queue; freed slots always go to the highest priority waiter whose class
+    still has room. Requests are shed when their class queue is full or they
+    wait longer than the class deadline. Runs on the event loop only, so no
+    locking is needed.
+    """
+
+    def __init__(self, total_limit: int, classes: List[AdmissionClass]):
+        self.total_limit = total_limit
+        self.in_flight = 0
+        self.classes = {admission_class.name: admission_class for admission_class in classes}
+        self._by_priority = sorted(classes, key=lambda admission_class: admission_class.priority)
+
+    def _has_capacity(self, admission_class: AdmissionClass) -> bool:
+        return self.in_flight < self.total_limit and admission_class.in_flight < admission_class.limit
+
+    def _start(self, admission_class: AdmissionClass) -> None:
+        self.in_flight += 1
+        admission_class.in_flight += 1
+        admission_class.admitted += 1
+
+    def _dispatch(self) -> None:
+        for admission_class in self._by_priority:
+            while admission_class.queue and self._has_capacity(admission_class):
+                waiter = admission_class.queue.popleft()
+                if waiter.done():
+                    continue
+                self._start(admission_class)
+                waiter.set_result(True)
+            if self.in_flight >= self.total_limit:
+                return
+
+    async def acquire(self, name: str) -> bool:
+        admission_class = self.classes[name]
+        waiting_ahead = any(
+            other.queue for other in self._by_priority if other.priority <= admission_class.priority
+        )
+        if not waiting_ahead and self._has_capacity(admission_class):
+            self._start(admission_class)
+            return True
+        
+        if len(admission_class.queue) >= admission_class.max_queue:
+            admission_class.shed_queue_full += 1
+            return False
+        
+        waiter = asyncio.get_running_loop().create_future()
+        admission_class.queue.append(waiter)
+        admission_class.max_queue_depth = max(admission_class.max_queue_depth, len(admission_class.queue))
+        # Waiters ahead may be blocked only by their own class limit
+        self._dispatch()
+        try:
+            # asyncio.wait never swallows a cancellation of this task, unlike
+            # wait_for when the waiter was granted in the same loop iteration
+            await asyncio.wait((waiter,), timeout=admission_class.max_wait)
+            if waiter.done():
+                return True
+            waiter.cancel()
+            admission_class.shed_timeout += 1
+            return False
+        except asyncio.CancelledError:
+            # Client went away while queued; hand back a slot granted meanwhile
+            if waiter.done() and not waiter.cancelled():
+                self.release(name)
+            waiter.cancel()
+            raise
+        finally:
+            if waiter.cancelled():
+                try:
+                    admission_class.queue.remove(waiter)
+                except ValueError:
+                    pass
+
+    def release(self, name: str) -> None:
+        admission_class = self.classes[name]
+        self.in_flight -= 1
+        admission_class.in_flight -= 1
+        self._dispatch()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "total_limit": self.total_limit,
+            "classes": {
+                admission_class.name: {
+                    "priority": admission_class.priority,
+                    "in_flight": admission_class.in_flight,
+                    "limit": admission_class.limit,
+                    "queue_depth": len(admission_class.queue),
+                    "max_queue_depth": admission_class.max_queue_depth,
+                    "admitted": admission_class.admitted,
+                    "shed_queue_full": admission_class.shed_queue_full,
+                    "shed_timeout": admission_class.shed_timeout,
+                }
+                for admission_class in self._by_priority
+            },
+        }
+
+def admission_class_from_env(
+    name: str, priority: int, limit: int, max_queue: int, max_wait_ms: int
+) -> AdmissionClass:
+    prefix = f"ADMISSION_{name.upper()}"
+    return AdmissionClass(
+        name,
+        priority,
+        limit=int(os.environ.get(f'{prefix}_LIMIT', limit)),
+        max_queue=int(os.environ.get(f'{prefix}_QUEUE', max_queue)),
+        max_wait_ms=int(os.environ.get(f'{prefix}_WAIT_MS', max_wait_ms)),
+    )
+
+admission = AdmissionController(
+    total_limit=int(os.environ.get('ADMISSION_TOTAL_LIMIT', 64)),
+    classes=[
+        admission_class_from_env('login', 0, limit=32, max_queue=200, max_wait_ms=2000),
+        admission_class_from_env('search', 1, limit=32, max_queue=100, max_wait_ms=500),
+        admission_class_from_env('registration', 2, limit=8, max_queue=50, max_wait_ms=1000),
+        admission_class_from_env('export', 3, limit=2, max_queue=4, max_wait_ms=250),
+    ],
+)
+
+def admission_class_for(method: str, path: str) -> Optional[str]:
+    """Map a request to its admission class; None bypasses admission control"""
+    if method == 'OPTIONS' or not path.startswith('/api/'):
+        return None
+    if path == '/api/auth/login' or (path.startswith('/api/users/') and path.endswith('/roles')):
+        return 'login'
+    if path == '/api/companies/search':
+        return 'search'
+    if path.startswith('/api/auth/register'):
+        return 'registration'
+    if 'export' in path:
+        return 'export'
+    return None
+
+class AdmissionControlMiddleware:
+    """ASGI middleware shedding load with 503 + Retry-After when overloaded"""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+        self.retry_after = os.environ.get('ADMISSION_RETRY_AFTER_SECONDS', '1')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        
+        name = admission_class_for(scope['method'], scope['path'])
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+        
+        if not await self.controller.acquire(name):
+            response = JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={"detail": "Servis geçici olarak yoğun, lütfen tekrar deneyin"},
+                headers={"Retry-After": self.retry_after},
+            )
+            await response(scope, receive, send)
+            return
+        
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(name)
+
+class RequestLoggingMiddleware:
+    """ASGI middleware tagging logs with a request id and logging route latency"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        
+        headers = dict(scope.get('headers') or [])
+        request_id = headers.get(b'x-request-id', b'').decode('latin-1')[:64] or uuid.uuid4().hex
+        token = request_context.set({"request_id": request_id, "method": scope['method']})
+        started = time.perf_counter()
+        status_code = 500
+        
+        async def send_with_request_id(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                message['headers'] = [
+                    *message.get('headers', []), (b'x-request-id', request_id.encode('latin-1'))
+                ]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            # The router stores the matched endpoint in scope; use its name so
+            # path parameters (signed segments) stay out of the logs. Requests
+            # that never reach the router (404s, shed) get a fixed placeholder.
+            endpoint = scope.get('endpoint')
+            route = getattr(endpoint, '__name__', None) or 'unmatched'
+            logger.log(
+                logging.WARNING if status_code >= 500 else logging.INFO,
+                "%s %s %s", scope['method'], route, status_code,
+                extra={
+                    "route": route,
+                    "status_code": status_code,
+                    "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+                },
+            )
+            request_context.reset(token)
+
+def init_clients() -> None:
+    """Create Mongo and Redis clients on first use"""
+    global client, db, companies_read, redis_client, redis_available
+
+    if client is None:
+        client = AsyncIOMotorClient(
+            os.environ['MONGO_URL'],
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=int(os.environ.get('MONGO_MIN_POOL_SIZE', 0)),
+            waitQueueTimeoutMS=int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 1000)),
+            serverSelectionTimeoutMS=int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 2000)),
+            connectTimeoutMS=int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', 2000)),
+            socketTimeoutMS=int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', 5000)),
+            event_listeners=[pool_metrics],
+        )
+        db = client[os.environ['DB_NAME']]
+        # Company search tolerates slightly stale data, keep it off the primary
+        companies_read = db.companies.with_options(read_preference=ReadPreference.SECONDARY_PREFERRED)
+
+    # Redis connection (optional for development)
+    if redis_client is None:
+        try:
+            redis_client = redis.from_url(os.environ.get('REDIS_URL', 'redis://localhost:6379'))
+            redis_available = True
+        except Exception:
+            redis_client = None
+            redis_available = False
+            logger.warning("Redis not available, using in-memory cache")
+
+async def close_clients() -> None:
+    global client, db, companies_read, redis_client, redis_available
+
+    if client is not None:
+        client.close()
+    if redis_available and redis_client:
+        await redis_client.close()
+    client = db = companies_read = redis_client = None
     redis_available = False
-    print("Warning: Redis not available, using in-memory cache")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup_started = time.perf_counter()
+    app.state.ready = False
+    app.state.import_ms = round((_import_finished - _import_started) * 1000, 1)
+    app.state.startup_ms = None
+    init_clients()
+    # Warm up in the background so /api/health/live answers right away and
+    # /api/health/ready flips only once pools, indexes and caches are in place
+    warmup_task = asyncio.create_task(warmup(app, startup_started))
+    try:
+        yield
+    finally:
+        app.state.ready = False
+        warmup_task.cancel()
+        # Let an in-flight ping, index build or directory reload unwind before
+        # the clients it uses are closed
+        with suppress(asyncio.CancelledError):
+            await warmup_task
+        await close_clients()
 
 # Create the main app
-app = FastAPI(title="Seç Ye API", version="1.0.0")
+app = FastAPI(title="Seç Ye API", version="1.0.0", lifespan=lifespan)
 api_router = APIRouter(prefix="/api")
 
+# Admission control runs inside CORS so shed responses stay readable by browsers
+app.add_middleware(AdmissionControlMiddleware, controller=admission)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -53,12 +599,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+# Outermost, so latency includes admission queueing and shed requests are logged
+app.add_middleware(RequestLoggingMiddleware)
+
+@app.exception_handler(ExecutionTimeout)
+@app.exception_handler(NetworkTimeout)
+@app.exception_handler(ServerSelectionTimeoutError)
+@app.exception_handler(WaitQueueTimeoutError)
+async def mongo_timeout_handler(request: Request, exc: Exception):
+    logger.warning("Database deadline exceeded on %s: %s", request.url.path, type(exc).__name__)
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Servis geçici olarak yoğun, lütfen tekrar deneyin"},
+        headers={"Retry-After": os.environ.get('MONGO_RETRY_AFTER_SECONDS', '1')},
+    )
 
 # ===== TYPES & MODELS =====
 CompanyType = Literal['corporate', 'catering', 'supplier']
@@ -145,6 +699,17 @@ class CompanySearchResponse(BaseModel):
     companies: List[Dict[str, Any]]
     has_more: bool
 
+class CompanyRoles(BaseModel):
+    company_id: str
+    company_name: Optional[str] = None
+    company_type: Optional[CompanyType] = None
+    roles: List[str]
+    highest_role: Optional[str] = None
+
+class UserRolesResponse(BaseModel):
+    user_id: str
+    companies: List[CompanyRoles]
+
 # ===== UTILITY FUNCTIONS =====
 def create_signed_path_segment(payload: Dict[str, Any], expires_in_hours: int = 2) -> str:
     """Create HMAC signed path segment"""
@@ -186,7 +751,7 @@ def verify_signed_path_segment(signed_segment: str) -> Optional[Dict[str, Any]]:
         
         return payload
     except Exception as e:
-        logger.error(f"Path segment verification failed: {e}")
+        logger.error("Path segment verification failed: %s", e)
         return None
 
 def create_turkce_slug(text: str) -> str:
@@ -206,9 +771,19 @@ def create_turkce_slug(text: str) -> str:
     
     return result
 
-async def get_user_roles_cached(user_id: str, company_id: str) -> List[str]:
+ROLE_CACHE_TTL_SECONDS = 60
+
+def role_cache_key(user_id: str, company_id: str) -> str:
+    return f"roles:{user_id}:{company_id}"
+
+def role_companies_cache_key(user_id: str) -> str:
+    return f"role_companies:{user_id}"
+
+async def get_user_roles_cached(
+    user_id: str, company_id: str, max_time_ms: int = MONGO_DEADLINES_MS['login']
+) -> List[str]:
     """Get user roles with Redis caching (fallback to direct DB query)"""
-    cache_key = f"roles:{user_id}:{company_id}"
+    cache_key = role_cache_key(user_id, company_id)
     
     # Try cache first (if Redis is available)
     if redis_available and redis_client:
@@ -224,24 +799,122 @@ async def get_user_roles_cached(user_id: str, company_id: str) -> List[str]:
         "user_id": user_id,
         "company_id": company_id,
         "is_active": True
-    }).to_list(None)
+    }, max_time_ms=max_time_ms).to_list(None)
     
     role_list = [role['role'] for role in roles]
     
     # Cache for 60 seconds (if Redis is available)
     if redis_available and redis_client:
         try:
-            await redis_client.setex(cache_key, 60, json.dumps(role_list))
+            await redis_client.setex(cache_key, ROLE_CACHE_TTL_SECONDS, json.dumps(role_list))
         except Exception:
             pass  # Cache operation failed, continue without caching
     
     return role_list
 
+async def get_user_roles_batch_cached(
+    user_id: str,
+    company_ids: Optional[List[str]] = None,
+    max_time_ms: int = MONGO_DEADLINES_MS['login']
+) -> Dict[str, List[str]]:
+    """Get user roles for many companies at once, keyed by company id.
+
+    With company_ids, cached entries are read with one MGET and only the misses
+    go to Mongo. Without them, every company the user has an active role in is
+    resolved, using the cached list of those companies when there is one. Either
+    way Mongo sees at most one role_assignments query, and the results are
+    written back with a single pipeline.
+    """
+    roles_by_company: Dict[str, List[str]] = {}
+    
+    # The user's company list is cached alongside the roles so the default
+    # lookup can use the MGET path as well
+    if company_ids is None and redis_available and redis_client:
+        try:
+            cached_company_ids = await redis_client.get(role_companies_cache_key(user_id))
+            if cached_company_ids:
+                company_ids = json.loads(cached_company_ids)
+        except Exception:
+            pass  # Fall back to database query
+    
+    missing = list(dict.fromkeys(company_ids)) if company_ids is not None else None
+    
+    # Try cache first (if Redis is available)
+    if missing and redis_available and redis_client:
+        try:
+            cached = await redis_client.mget([role_cache_key(user_id, company_id) for company_id in missing])
+            for company_id, cached_roles in zip(missing, cached):
+                if cached_roles:
+                    roles_by_company[company_id] = json.loads(cached_roles)
+            missing = [company_id for company_id in missing if company_id not in roles_by_company]
+        except Exception:
+            pass  # Fall back to database query
+    
+    if missing is not None and not missing:
+        return roles_by_company
+    
+    # Query database, one round trip for every company still unresolved
+    filter_query: Dict[str, Any] = {"user_id": user_id, "is_active": True}
+    if missing is not None:
+        filter_query["company_id"] = {"$in": missing}
+    assignments = await db.role_assignments.find(
+        filter_query, {"_id": 0, "company_id": 1, "role": 1}, max_time_ms=max_time_ms
+    ).to_list(None)
+    
+    fetched: Dict[str, List[str]] = {company_id: [] for company_id in missing or []}
+    for assignment in assignments:
+        fetched.setdefault(assignment['company_id'], []).append(assignment['role'])
+    roles_by_company.update(fetched)
+    
+    # Cache for 60 seconds (if Redis is available)
+    if (fetched or missing is None) and redis_available and redis_client:
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for company_id, role_list in fetched.items():
+                    pipe.setex(role_cache_key(user_id, company_id), ROLE_CACHE_TTL_SECONDS, json.dumps(role_list))
+                if missing is None:
+                    pipe.setex(role_companies_cache_key(user_id), ROLE_CACHE_TTL_SECONDS, json.dumps(list(fetched)))
+                await pipe.execute()
+        except Exception:
+            pass  # Cache operation failed, continue without caching
+    
+    return roles_by_company
+
+async def rehash_password(user_id: str, old_hash: str, password: str) -> None:
+    """Re-hash password with current Argon2 parameters and store it"""
+    try:
+        new_hash = await asyncio.to_thread(ph.hash, password)
+        # Only replace the hash we verified against, so a concurrent password
+        # change is never overwritten
+        await db.users.update_one(
+            {"id": user_id, "password_hash": old_hash},
+            {"$set": {"password_hash": new_hash, "updated_at": datetime.now(timezone.utc)}}
+        )
+    except Exception as e:
+        logger.error("Password rehash error: %s", e)
+
 # ===== API ENDPOINTS =====
 @api_router.get("/")
 async def root():
     return {"message": "Seç Ye API - Multi-tenant Yemek Seçim Platformu"}
 
+@api_router.get("/metrics/mongo-pool")
+async def mongo_pool_metrics():
+    """Connection pool gauges for this worker"""
+    return pool_metrics.snapshot()
+
+@api_router.get("/metrics/logging")
+async def logging_metrics():
+    """Log queue depth and records dropped because the queue was full"""
+    return log_queue_stats()
+
+@api_router.get("/metrics/admission")
+async def admission_metrics():
+    """Admission control queue depth and shed counts for this worker"""
+    return admission.snapshot()
+
+REGEX_SYNTAX = re.compile(r'[.^$*+?{}\[\]\\|()]')
+
 @api_router.get("/companies/search")
 async def search_companies(
     type: CompanyType,
@@ -250,12 +923,26 @@ async def search_companies(
     offset: int = 0
 ):
     """Search companies with server-side pagination"""
+    # Serve plain-text queries from the in-process directory when it is warm.
+    # Queries with regex syntax go to Mongo, where maxTimeMS bounds them; running
+    # them here could backtrack on the event loop without any limit.
+    directory = company_directory.get(type)
+    if directory is not None and not REGEX_SYNTAX.search(query):
+        pattern = re.compile(re.escape(query), re.IGNORECASE) if query else None
+        matches = [c for c in directory if pattern is None or pattern.search(c["name"])]
+        return CompanySearchResponse(
+            companies=matches[offset:offset + limit],
+            has_more=len(matches) > offset + limit
+        )
+    
     filter_query = {"type": type, "is_active": True}
     
     if query:
         filter_query["name"] = {"$regex": query, "$options": "i"}
     
-    companies = await db.companies.find(filter_query).skip(offset).limit(limit + 1).to_list(None)
+    companies = await companies_read.find(
+        filter_query, max_time_ms=MONGO_DEADLINES_MS['search']
+    ).skip(offset).limit(limit + 1).to_list(None)
     
     has_more = len(companies) > limit
     if has_more:
@@ -273,11 +960,13 @@ async def search_companies(
     return CompanySearchResponse(companies=company_list, has_more=has_more)
 
 @api_router.post("/auth/login")
-async def login(request: LoginRequest, response: Response):
+async def login(request: LoginRequest, response: Response, background_tasks: BackgroundTasks):
     """Unified login endpoint"""
     try:
         # Find user by phone
-        user = await db.users.find_one({"phone": request.phone, "is_active": True})
+        user = await db.users.find_one(
+            {"phone": request.phone, "is_active": True}, max_time_ms=MONGO_DEADLINES_MS['login']
+        )
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -286,13 +975,17 @@ async def login(request: LoginRequest, response: Response):
         
         # Verify password
         try:
-            ph.verify(user['password_hash'], request.password)
+            await asyncio.to_thread(ph.verify, user['password_hash'], request.password)
         except VerifyMismatchError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Telefon numarası veya şifre hatalı"
             )
         
+        # Upgrade hashes created with outdated Argon2 parameters after the response
+        if ph.check_needs_rehash(user['password_hash']):
+            background_tasks.add_task(rehash_password, user['id'], user['password_hash'], request.password)
+        
         # Check if user has role in requested company
         roles = await get_user_roles_cached(user['id'], request.company_id)
         if not roles:
@@ -303,7 +996,7 @@ async def login(request: LoginRequest, response: Response):
                     "id": request.company_id,
                     "type": "corporate",
                     "is_active": True
-                })
+                }, max_time_ms=MONGO_DEADLINES_MS['login'])
                 if not company:
                     raise HTTPException(status_code=404, detail="Şirket bulunamadı")
                 
@@ -343,10 +1036,10 @@ async def login(request: LoginRequest, response: Response):
             detail="Yetkisiz erişim"
         )
         
-    except HTTPException:
+    except (HTTPException, *MONGO_TIMEOUT_ERRORS):
         raise
     except Exception as e:
-        logger.error(f"Login error: {e}")
+        logger.error("Login error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Giriş işlemi sırasında hata oluştu"
@@ -357,7 +1050,9 @@ async def register_corporate_application(request: CorporateApplicationRequest):
     """Submit corporate account application"""
     try:
         # Check if phone already exists
-        existing_user = await db.users.find_one({"phone": request.applicant["phone"]})
+        existing_user = await db.users.find_one(
+            {"phone": request.applicant["phone"]}, max_time_ms=MONGO_DEADLINES_MS['register']
+        )
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -365,7 +1060,7 @@ async def register_corporate_application(request: CorporateApplicationRequest):
             )
         
         # Hash password
-        password_hash = ph.hash(request.password)
+        password_hash = await asyncio.to_thread(ph.hash, request.password)
         
         # Create application document
         application = {
@@ -385,7 +1080,7 @@ async def register_corporate_application(request: CorporateApplicationRequest):
             company = await db.companies.find_one({
                 "id": request.target["company_id"],
                 "is_active": True
-            })
+            }, max_time_ms=MONGO_DEADLINES_MS['register'])
             if not company:
                 raise HTTPException(status_code=404, detail="Şirket bulunamadı")
         
@@ -411,10 +1106,10 @@ async def register_corporate_application(request: CorporateApplicationRequest):
             application_id=application["id"]
         )
         
-    except HTTPException:
+    except (HTTPException, *MONGO_TIMEOUT_ERRORS):
         raise
     except Exception as e:
-        logger.error(f"Corporate application error: {e}")
+        logger.error("Corporate application error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Başvuru işlemi sırasında hata oluştu"
@@ -425,7 +1120,9 @@ async def register_individual(request: RegisterIndividualRequest):
     """Register individual user"""
     try:
         # Check if phone already exists
-        existing_user = await db.users.find_one({"phone": request.phone})
+        existing_user = await db.users.find_one(
+            {"phone": request.phone}, max_time_ms=MONGO_DEADLINES_MS['register']
+        )
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -437,12 +1134,12 @@ async def register_individual(request: RegisterIndividualRequest):
             "id": request.company_id,
             "type": request.company_type,
             "is_active": True
-        })
+        }, max_time_ms=MONGO_DEADLINES_MS['register'])
         if not company:
             raise HTTPException(status_code=404, detail="Şirket bulunamadı")
         
         # Hash password
-        password_hash = ph.hash(request.password)
+        password_hash = await asyncio.to_thread(ph.hash, request.password)
         
         # Create user
         user = User(
@@ -455,15 +1152,74 @@ async def register_individual(request: RegisterIndividualRequest):
         
         return {"success": True, "message": "Kayıt başarılı"}
         
-    except HTTPException:
+    except (HTTPException, *MONGO_TIMEOUT_ERRORS):
         raise
     except Exception as e:
-        logger.error(f"Individual registration error: {e}")
+        logger.error("Individual registration error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Kayıt işlemi sırasında hata oluştu"
         )
 
+# Bounds the MGET and $in sizes of one request in the top admission class
+ROLE_LOOKUP_MAX_COMPANIES = 100
+
+@api_router.get("/users/{enc_user_id}/roles", response_model=UserRolesResponse)
+async def get_user_company_roles(
+    enc_user_id: str,
+    company_ids: Optional[List[str]] = Query(default=None, max_length=ROLE_LOOKUP_MAX_COMPANIES)
+):
+    """Roles and highest role of a user in each of their companies (company switcher)"""
+    payload = verify_signed_path_segment(enc_user_id)
+    if not payload or 'user_id' not in payload:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Geçersiz veya süresi dolmuş bağlantı"
+        )
+    user_id = payload['user_id']
+    
+    try:
+        roles_by_company = await get_user_roles_batch_cached(user_id, company_ids)
+        company_ids_with_roles = [company_id for company_id, roles in roles_by_company.items() if roles]
+        
+        # Company names come from the warm directory; only unknown ids hit Mongo.
+        # Inactive or missing companies are left out of the switcher.
+        unknown_ids = [company_id for company_id in company_ids_with_roles if company_id not in company_index]
+        companies = {
+            company_id: company_index[company_id]
+            for company_id in company_ids_with_roles if company_id in company_index
+        }
+        if unknown_ids:
+            docs = await db.companies.find(
+                {"id": {"$in": unknown_ids}, "is_active": True},
+                {"_id": 0, "id": 1, "name": 1, "type": 1},
+                max_time_ms=MONGO_DEADLINES_MS['login']
+            ).to_list(None)
+            companies.update((company["id"], company) for company in docs)
+        
+        return UserRolesResponse(
+            user_id=user_id,
+            companies=[
+                CompanyRoles(
+                    company_id=company_id,
+                    company_name=companies[company_id]["name"],
+                    company_type=companies[company_id]["type"],
+                    roles=roles_by_company[company_id],
+                    highest_role=get_highest_role(roles_by_company[company_id])
+                )
+                for company_id in company_ids_with_roles if company_id in companies
+            ]
+        )
+        
+    except (HTTPException, *MONGO_TIMEOUT_ERRORS):
+        raise
+    except Exception as e:
+        logger.error("User roles lookup error: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Yetkiler alınırken hata oluştu"
+        )
+
 def get_highest_role(roles: List[str]) -> Optional[str]:
     """Get highest priority role from list"""
     role_priority = {
@@ -477,11 +1233,161 @@ def get_highest_role(roles: List[str]) -> Optional[str]:
     
     return max(roles, key=lambda role: role_priority.get(role, 0))
 
+# ===== STARTUP & HEALTH =====
+COMPANY_DIRECTORY_TTL_SECONDS = int(os.environ.get('COMPANY_DIRECTORY_TTL_SECONDS', 60))
+COMPANY_DIRECTORY_MAX_SIZE = int(os.environ.get('COMPANY_DIRECTORY_MAX_SIZE', 20000))
+ROLE_CACHE_WARM_LIMIT = int(os.environ.get('ROLE_CACHE_WARM_LIMIT', 5000))
+ROLE_CACHE_WARM_TIMEOUT_MS = int(os.environ.get('ROLE_CACHE_WARM_TIMEOUT_MS', 5000))
+MONGO_WARMUP_CONNECTIONS = int(os.environ.get('MONGO_WARMUP_CONNECTIONS', 10))
+
+# Active companies by type, in Mongo's natural order; empty until warmup loads it
+company_directory: Dict[str, List[Dict[str, Any]]] = {}
+# The same companies keyed by id
+company_index: Dict[str, Dict[str, Any]] = {}
+
+async def ensure_indexes() -> None:
+    """Create indexes used by the hot query paths (no-op when they exist).
+
+    Failures are logged and skipped: an option conflict with an existing index
+    or a missing createIndex privilege will not go away on retry, and the
+    worker can serve without them.
+    """
+    indexes = [
+        (db.users, "phone"),
+        (db.users, "id"),
+        (db.companies, [("type", 1), ("is_active", 1)]),
+        (db.companies, "id"),
+        (db.role_assignments, [("user_id", 1), ("company_id", 1), ("is_active", 1)]),
+    ]
+    for collection, keys in indexes:
+        try:
+            await collection.create_index(keys)
+        except Exception as e:
+            logger.warning("Index creation on %s failed: %s", collection.name, e)
+
+async def prewarm_pools() -> None:
+    """Open connections up front so first requests skip the handshake"""
+    connections = max(1, min(MONGO_WARMUP_CONNECTIONS, MONGO_MAX_POOL_SIZE))
+    await asyncio.gather(*(client.admin.command('ping') for _ in range(connections)))
+    
+    if redis_available and redis_client:
+        try:
+            await redis_client.ping()
+        except Exception as e:
+            logger.warning("Redis warmup failed: %s", e)
+
+async def load_company_directory() -> None:
+    """Load active companies into memory for search_companies"""
+    docs = await companies_read.find(
+        {"is_active": True}, {"_id": 0, "id": 1, "name": 1, "slug": 1, "type": 1}
+    ).to_list(COMPANY_DIRECTORY_MAX_SIZE + 1)
+    
+    if len(docs) > COMPANY_DIRECTORY_MAX_SIZE:
+        # Too large to hold per worker, keep querying Mongo
+        company_directory.clear()
+        company_index.clear()
+        return
+    
+    directory: Dict[str, List[Dict[str, Any]]] = {
+        company_type: [] for company_type in ('corporate', 'catering', 'supplier')
+    }
+    for company in docs:
+        directory.setdefault(company["type"], []).append({
+            "id": company["id"],
+            "name": company["name"],
+            "slug": company["slug"],
+            "type": company["type"]
+        })
+    company_directory.clear()
+    company_directory.update(directory)
+    company_index.clear()
+    company_index.update(
+        (company["id"], company) for companies in directory.values() for company in companies
+    )
+
+async def preload_role_cache() -> None:
+    """Fill the Redis role cache for active assignments"""
+    if not (redis_available and redis_client):
+        return
+    
+    # Optional optimisation: failures are logged and never hold up readiness
+    try:
+        # Group before limiting so every cached (user, company) entry holds the
+        # complete role list; a partial one would hide roles at login
+        groups = await db.role_assignments.aggregate([
+            {"$match": {"is_active": True}},
+            {"$group": {
+                "_id": {"user_id": "$user_id", "company_id": "$company_id"},
+                "roles": {"$push": "$role"}
+            }},
+            {"$limit": ROLE_CACHE_WARM_LIMIT},
+        ], maxTimeMS=ROLE_CACHE_WARM_TIMEOUT_MS, allowDiskUse=True).to_list(None)
+        
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for group in groups:
+                cache_key = role_cache_key(group['_id']['user_id'], group['_id']['company_id'])
+                pipe.setex(cache_key, ROLE_CACHE_TTL_SECONDS, json.dumps(group['roles']))
+            await pipe.execute()
+    except Exception as e:
+        logger.warning("Role cache preload failed: %s", e)
+
+async def warmup(app: FastAPI, startup_started: float) -> None:
+    """Prepare connections, indexes and caches, then mark the worker ready"""
+    # Only connectivity and the directory load are retried; index creation and
+    # the role cache are best effort and never keep the worker unready
+    delay = 1.0
+    while True:
+        try:
+            await prewarm_pools()
+            await load_company_directory()
+            break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Warmup failed, retrying in %.0fs: %s", delay, e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+    
+    await ensure_indexes()
+    await preload_role_cache()
+    
+    app.state.startup_ms = round((time.perf_counter() - startup_started) * 1000, 1)
+    app.state.ready = True
+    logger.info("Worker ready: import %s ms, startup %s ms", app.state.import_ms, app.state.startup_ms)
+    
+    # Keep the company directory fresh for the lifetime of the worker
+    while True:
+        await asyncio.sleep(COMPANY_DIRECTORY_TTL_SECONDS)
+        try:
+            await load_company_directory()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Stale results are worse than slower ones, fall back to Mongo
+            company_directory.clear()
+            company_index.clear()
+            logger.warning("Company directory refresh failed: %s", e)
+
+@api_router.get("/health/live")
+async def health_live():
+    """Liveness probe: the process is up and serving"""
+    return {"status": "alive"}
+
+@api_router.get("/health/ready")
+async def health_ready(request: Request):
+    """Readiness probe: connections, indexes and caches are warm"""
+    state = request.app.state
+    body = {
+        "status": "ready" if getattr(state, 'ready', False) else "starting",
+        "import_ms": getattr(state, 'import_ms', None),
+        "startup_ms": getattr(state, 'startup_ms', None),
+        "company_directory_size": sum(len(companies) for companies in company_directory.values()),
+    }
+    if not getattr(state, 'ready', False):
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=body)
+    return body
+
 # Include router
 app.include_router(api_router)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
-    if redis_available and redis_client:
-        await redis_client.close()
\ No newline at end of file
+_import_finished = time.perf_counter()
@@ -0,0 +1,124 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+from server import AdmissionClass, AdmissionController  # noqa: E402
+
+
+def make_controller(total_limit=1, **overrides):
+    settings = {
+        'login': dict(priority=0, limit=1, max_queue=10, max_wait_ms=1000),
+        'search': dict(priority=1, limit=1, max_queue=10, max_wait_ms=1000),
+        'export': dict(priority=3, limit=1, max_queue=10, max_wait_ms=1000),
+    }
+    for name, values in overrides.items():
+        settings[name].update(values)
+    return AdmissionController(
+        total_limit, [AdmissionClass(name, **values) for name, values in settings.items()]
+    )
+
+
+def test_sheds_when_queue_is_full():
+    async def scenario():
+        controller = make_controller(search={'max_queue': 1})
+        assert await controller.acquire('search')
+        queued = asyncio.create_task(controller.acquire('search'))
+        await asyncio.sleep(0)
+
+        assert await controller.acquire('search') is False
+
+        controller.release('search')
+        assert await queued
+        controller.release('search')
+        return controller.snapshot()['classes']['search']
+
+    stats = asyncio.run(scenario())
+    assert stats['shed_queue_full'] == 1
+    assert stats['admitted'] == 2
+    assert stats['in_flight'] == 0
+
+
+def test_sheds_when_queue_wait_exceeds_deadline():
+    async def scenario():
+        controller = make_controller(search={'max_wait_ms': 20})
+        assert await controller.acquire('search')
+
+        assert await controller.acquire('search') is False
+
+        controller.release('search')
+        return controller
+
+    controller = asyncio.run(scenario())
+    stats = controller.snapshot()['classes']['search']
+    assert stats['shed_timeout'] == 1
+    assert stats['queue_depth'] == 0
+    assert controller.in_flight == 0
+
+
+def test_freed_slots_go_to_highest_priority_waiter():
+    async def scenario():
+        controller = make_controller(total_limit=1)
+        order = []
+
+        async def request(name):
+            assert await controller.acquire(name)
+            order.append(name)
+            await asyncio.sleep(0.01)
+            controller.release(name)
+
+        holder = asyncio.create_task(request('export'))
+        await asyncio.sleep(0)
+        # Queued lowest priority first; dispatch must still serve login first
+        waiters = [asyncio.create_task(request(name)) for name in ('export', 'search', 'login')]
+        await asyncio.gather(holder, *waiters)
+        return order
+
+    assert asyncio.run(scenario()) == ['export', 'login', 'search', 'export']
+
+
+def test_cancelled_waiter_does_not_leak_slot():
+    async def scenario():
+        controller = make_controller()
+        assert await controller.acquire('search')
+        waiter = asyncio.create_task(controller.acquire('search'))
+        await asyncio.sleep(0)
+
+        # Grant the slot to the waiter, then cancel it before it resumes
+        controller.release('search')
+        waiter.cancel()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            pass
+
+        assert controller.in_flight == 0
+        assert controller.classes['search'].in_flight == 0
+        assert await controller.acquire('search')
+        controller.release('search')
+        return controller
+
+    controller = asyncio.run(scenario())
+    assert controller.snapshot()['classes']['search']['queue_depth'] == 0
+
+
+def test_cancelled_waiter_leaves_queue():
+    async def scenario():
+        controller = make_controller()
+        assert await controller.acquire('search')
+        waiter = asyncio.create_task(controller.acquire('search'))
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            pass
+
+        assert len(controller.classes['search'].queue) == 0
+        controller.release('search')
+        return controller
+
+    controller = asyncio.run(scenario())
+    assert controller.in_flight == 0
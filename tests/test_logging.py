@@ -0,0 +1,67 @@
+import io
+import json
+import logging
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+import server  # noqa: E402
+
+
+def capture_logs(emit):
+    stream = io.StringIO()
+    server.configure_logging(stream=stream, use_queue=True, sample_rate=1.0)
+    try:
+        emit()
+    finally:
+        server.stop_log_listener()
+        logging.getLogger().handlers.clear()
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_queued_exception_keeps_exc_info_field():
+    def emit():
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            server.logger.exception("failed %s", 42)
+
+    [entry] = capture_logs(emit)
+    assert entry["message"] == "failed 42"
+    assert "ZeroDivisionError" in entry["exc_info"]
+
+
+def test_unrouted_request_does_not_log_path():
+    from fastapi.testclient import TestClient
+
+    def emit():
+        TestClient(server.app).get('/api/nope/SECRET')
+
+    entries = [entry for entry in capture_logs(emit) if entry["logger"] == "server"]
+    assert entries[-1]["route"] == "unmatched"
+    assert all("SECRET" not in json.dumps(entry) for entry in entries)
+
+
+def test_uvicorn_loggers_go_through_queue():
+    uvicorn_error = logging.getLogger('uvicorn.error')
+    uvicorn_error.addHandler(logging.StreamHandler(io.StringIO()))
+    uvicorn_error.propagate = False
+
+    [entry] = capture_logs(lambda: uvicorn_error.info("Started server process"))
+
+    assert entry["logger"] == "uvicorn.error"
+    assert uvicorn_error.handlers == []
+    assert logging.getLogger('uvicorn.access').disabled
+
+
+def test_full_queue_drops_are_counted(monkeypatch):
+    handler = server.DroppingQueueHandler(server.queue.Queue(1))
+    monkeypatch.setattr(logging.getLogger(), 'handlers', [handler])
+
+    for _ in range(3):
+        server.logger.warning("burst")
+
+    stats = server.log_queue_stats()
+    assert stats["dropped"] == 2
+    assert stats["queued"] == 1
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+import server  # noqa: E402
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return self.docs
+
+
+class FakeRoleAssignments:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, filter_query, projection=None, **kwargs):
+        self.queries.append(filter_query)
+        company_filter = filter_query.get("company_id")
+        return FakeCursor([
+            doc for doc in self.docs
+            if doc["user_id"] == filter_query["user_id"]
+            and (company_filter is None or doc["company_id"] in company_filter["$in"])
+        ])
+
+
+class FakeDB:
+    def __init__(self, docs):
+        self.role_assignments = FakeRoleAssignments(docs)
+
+
+class FakePipeline:
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def setex(self, key, ttl, value):
+        self.commands.append((key, value))
+
+    async def execute(self):
+        self.redis_client.store.update(self.commands)
+
+
+class FakeRedis:
+    def __init__(self, store=None, fail=False):
+        self.store = dict(store or {})
+        self.fail = fail
+        self.mget_calls = []
+
+    async def get(self, key):
+        if self.fail:
+            raise ConnectionError("redis down")
+        return self.store.get(key)
+
+    async def mget(self, keys):
+        if self.fail:
+            raise ConnectionError("redis down")
+        self.mget_calls.append(keys)
+        return [self.store.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        if self.fail:
+            raise ConnectionError("redis down")
+        return FakePipeline(self)
+
+
+ASSIGNMENTS = [
+    {"user_id": "u1", "company_id": "c1", "role": "corporate1"},
+    {"user_id": "u1", "company_id": "c1", "role": "corporateOwner"},
+    {"user_id": "u1", "company_id": "c2", "role": "catering2"},
+]
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    def install(store=None, fail=False):
+        db = FakeDB(ASSIGNMENTS)
+        redis_client = FakeRedis(store, fail)
+        monkeypatch.setattr(server, "db", db)
+        monkeypatch.setattr(server, "redis_client", redis_client)
+        monkeypatch.setattr(server, "redis_available", True)
+        return db, redis_client
+    return install
+
+
+def lookup(company_ids=None):
+    return asyncio.run(server.get_user_roles_batch_cached("u1", company_ids))
+
+
+def test_all_cache_hits_skip_mongo(backends):
+    db, _ = backends({
+        "roles:u1:c1": json.dumps(["corporateOwner"]),
+        "roles:u1:c2": json.dumps(["catering2"]),
+    })
+
+    assert lookup(["c1", "c2"]) == {"c1": ["corporateOwner"], "c2": ["catering2"]}
+    assert db.role_assignments.queries == []
+
+
+def test_partial_hits_query_only_misses(backends):
+    db, redis_client = backends({"roles:u1:c1": json.dumps(["corporate1"])})
+
+    assert lookup(["c1", "c2"]) == {"c1": ["corporate1"], "c2": ["catering2"]}
+    assert db.role_assignments.queries == [
+        {"user_id": "u1", "is_active": True, "company_id": {"$in": ["c2"]}}
+    ]
+    assert json.loads(redis_client.store["roles:u1:c2"]) == ["catering2"]
+
+
+def test_companies_without_roles_are_cached_empty(backends):
+    _, redis_client = backends()
+
+    assert lookup(["c3"]) == {"c3": []}
+    assert json.loads(redis_client.store["roles:u1:c3"]) == []
+
+
+def test_all_companies_lookup_caches_company_list(backends):
+    db, redis_client = backends()
+
+    assert lookup() == {"c1": ["corporate1", "corporateOwner"], "c2": ["catering2"]}
+    assert db.role_assignments.queries == [{"user_id": "u1", "is_active": True}]
+    assert json.loads(redis_client.store["role_companies:u1"]) == ["c1", "c2"]
+
+
+def test_all_companies_lookup_uses_cached_company_list(backends):
+    db, redis_client = backends({
+        "role_companies:u1": json.dumps(["c1", "c2"]),
+        "roles:u1:c1": json.dumps(["corporate1"]),
+        "roles:u1:c2": json.dumps(["catering2"]),
+    })
+
+    assert lookup() == {"c1": ["corporate1"], "c2": ["catering2"]}
+    assert redis_client.mget_calls == [["roles:u1:c1", "roles:u1:c2"]]
+    assert db.role_assignments.queries == []
+
+
+def test_redis_errors_fall_back_to_mongo(backends):
+    db, _ = backends(fail=True)
+
+    assert lookup(["c1"]) == {"c1": ["corporate1", "corporateOwner"]}
+    assert lookup() == {"c1": ["corporate1", "corporateOwner"], "c2": ["catering2"]}
+    assert len(db.role_assignments.queries) == 2